@@ -86,6 +86,19 @@ CREATE TABLE orderitems (
     FOREIGN KEY (PartID) REFERENCES parts(PartID)
 );
 
+-- Idempotency keys of writes applied by the background write queue (write_queue.py).
+-- Inserted in the same transaction as the write so a retried job is never applied twice.
+CREATE TABLE appliedwrites (
+    IdempotencyKey VARCHAR(64) PRIMARY KEY,
+    ResultID INT,
+    AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 5. Indexes
+-- -------------------------------------------------
+-- Lets the mechanic calendar fetch a date range without scanning every appointment.
+CREATE INDEX idx_appointments_date_mechanic ON serviceappointments (AppointmentDate, MechanicID);
+
 -- Select the database to use
 USE AUTOSERVICEDB;
 
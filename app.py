@@ -1,7 +1,11 @@
 import streamlit as st
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 import pandas as pd
 import datetime
+import uuid
+import scheduling
+import db_backend
+import write_queue
 
 # Set the page configuration (do this first!)
 st.set_page_config(
@@ -51,6 +55,8 @@ inject_custom_css()
 # --- DATABASE CONNECTION ---
 try:
     conn = st.connection("autoservicedb", type="sql", ttl=10)
+    if conn.engine.dialect.name == "sqlite":
+        db_backend.install_sqlite(conn.engine)
     conn.query("SELECT 1;")
 except Exception as e:
     st.error(f"Error connecting to database: {e}")
@@ -97,6 +103,18 @@ def get_appointments():
     """
     return conn.query(query, ttl=0)
 
+@st.cache_data(ttl=60)
+def get_appointments_in_range(start, end):
+    # Range predicate on AppointmentDate so idx_appointments_date_mechanic is used.
+    query = """
+    SELECT sa.AppointmentID, sa.MechanicID, sa.AppointmentDate, sa.DurationMinutes, sa.Status
+    FROM serviceappointments sa
+    WHERE sa.AppointmentDate >= :start AND sa.AppointmentDate < :end
+      AND sa.Status <> 'Cancelled'
+    ORDER BY sa.MechanicID, sa.AppointmentDate;
+    """
+    return conn.query(query, params={"start": start, "end": end}, ttl=0)
+
 @st.cache_data(ttl=60)
 def get_orders():
     query = """
@@ -118,6 +136,124 @@ def get_order_items(order_id):
     """
     return conn.query(items_query, params={"id": order_id}, ttl=0)
 
+# --- BACKGROUND WRITES ---
+@st.cache_resource
+def get_write_queue(db_url):
+    # One queue per server process and target database (the URL is the cache key, so changed
+    # connection secrets get a new queue); it opens its own engine so it outlives the connection's ttl.
+    return write_queue.WriteQueue(db_url)
+
+write_db_url = conn.engine.url.render_as_string(hide_password=False)
+
+# Caches to clear once a write of each kind has been applied.
+WRITE_CACHES = {
+    "place_order": [get_orders, get_parts, get_order_items],
+    "book_appointment": [get_appointments, get_appointments_in_range],
+    "update_appointment_status": [get_appointments, get_appointments_in_range],
+    "cancel_appointment": [get_appointments, get_appointments_in_range],
+    "update_order_status": [get_orders],
+}
+
+if 'pending_writes' not in st.session_state:
+    st.session_state.pending_writes = {}
+if 'write_messages' not in st.session_state:
+    st.session_state.write_messages = []
+if 'write_tokens' not in st.session_state:
+    st.session_state.write_tokens = {}
+
+def submission_token(source):
+    """Token for the next submission from ``source`` (a form or button); it becomes the job's idempotency key."""
+    if source not in st.session_state.write_tokens:
+        st.session_state.write_tokens[source] = uuid.uuid4().hex
+    return st.session_state.write_tokens[source]
+
+def submit_write(kind, payload, description, source, token, **details):
+    """Queue a write under the ``token`` rendered with the form; a second click on the same render reuses the job.
+
+    ``details`` are kept with the pending job in session state (e.g. the cart an order was placed from).
+    """
+    get_write_queue(write_db_url).submit(token, kind, payload)
+    # The URL is kept so the job is polled on the queue it went to, even if the connection changes.
+    st.session_state.pending_writes.setdefault(
+        token, {"kind": kind, "description": description, "db_url": write_db_url, **details}
+    )
+    if st.session_state.write_tokens.get(source) == token:
+        # The next submission from this form is a new write, even with identical values.
+        st.session_state.write_tokens[source] = uuid.uuid4().hex
+
+@st.fragment(run_every=1)
+def show_pending_writes():
+    finished = False
+    for key, job in list(st.session_state.pending_writes.items()):
+        state = get_write_queue(job["db_url"]).status(key)
+        if state is None or state["status"] in (write_queue.PENDING, write_queue.RUNNING):
+            continue
+        del st.session_state.pending_writes[key]
+        finished = True
+        if state["status"] == write_queue.DONE:
+            for cached in WRITE_CACHES[job["kind"]]:
+                cached.clear()
+            if job["kind"] == "place_order":
+                st.session_state.write_messages.append(("success", f"Order #{state['result']} placed successfully!"))
+            else:
+                st.session_state.write_messages.append(("success", f"{job['description']}: done."))
+        else:
+            st.session_state.write_messages.append(("error", f"{job['description']} failed: {state['error']}"))
+            if job["kind"] == "place_order":
+                # Put the order's lines back, merged with anything added since it was submitted.
+                for item in job["cart"]:
+                    add_cart_item(st.session_state.cart, item["PartID"], item["PartName"], item["Quantity"], item["Price"])
+    if finished:
+        # Only a timer-driven fragment run needs a full rerun to refresh the page; doing it
+        # during a full run would drop the click that started that run.
+        if st.session_state.write_poll_can_rerun:
+            st.rerun(scope="app")
+
+    for level, message in st.session_state.write_messages:
+        if level == "success":
+            st.success(message)
+        else:
+            st.error(message)
+    st.session_state.write_messages = []
+    for job in st.session_state.pending_writes.values():
+        st.info(f"{job['description']}: saving...")
+
+# --- CART HELPERS ---
+def add_cart_item(cart, part_id, part_name, quantity, price):
+    # Keep one line per part so stock checks see the full requested quantity.
+    for item in cart:
+        if item["PartID"] == part_id:
+            item["Quantity"] += quantity
+            return
+    cart.append({"PartID": part_id, "PartName": part_name, "Quantity": quantity, "Price": price})
+
+def check_cart(cart):
+    """Re-check every cart line against current stock and prices in one query.
+
+    Returns (shortages, price_changes) as lists of messages; price changes are
+    applied to the cart so the clerk can review the new total.
+    """
+    query = text("SELECT PartID, PartName, Price, StockQuantity FROM parts WHERE PartID IN :ids;").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    with conn.session as s:
+        current = {row.PartID: row for row in s.execute(query, {"ids": [item["PartID"] for item in cart]})}
+
+    shortages, price_changes = [], []
+    for item in cart:
+        part = current.get(item["PartID"])
+        if part is None:
+            shortages.append(f"{item['PartName']} is no longer available.")
+        elif part.StockQuantity < item["Quantity"]:
+            shortages.append(f"{item['PartName']}: requested {item['Quantity']}, only {part.StockQuantity} in stock.")
+        elif round(float(part.Price), 2) != round(float(item["Price"]), 2):
+            price_changes.append(f"{item['PartName']}: ${float(item['Price']):.2f} -> ${float(part.Price):.2f}")
+            item["Price"] = float(part.Price)
+    return shortages, price_changes
+
+st.session_state.write_poll_can_rerun = False
+show_pending_writes()
+
 # --- NAVIGATION TABS ---
 tab_customers, tab_bookings, tab_shop, tab_admin = st.tabs([
     "Customers & Vehicles", 
@@ -158,9 +294,8 @@ with tab_customers:
                         st.warning("First Name, Last Name, and Email are required.")
                     else:
                         try:
-                            query = text("CALL sp_AddCustomer(:fname, :lname, :email, :phone, :address);")
                             with conn.session as s:
-                                s.execute(query, {"fname": first_name, "lname": last_name, "email": email, "phone": phone, "address": address})
+                                db_backend.call_procedure(s, "sp_AddCustomer", first_name, last_name, email, phone, address)
                                 s.commit()
                             st.toast("Customer added successfully!")
                             get_customers.clear()
@@ -191,9 +326,8 @@ with tab_customers:
                         submitted = st.form_submit_button("Save Changes")
                         if submitted:
                             try:
-                                query = text("CALL sp_UpdateCustomer(:id, :fname, :lname, :email, :phone, :address);")
                                 with conn.session as s:
-                                    s.execute(query, {"id": selected_id, "fname": first_name, "lname": last_name, "email": email, "phone": phone, "address": address})
+                                    db_backend.call_procedure(s, "sp_UpdateCustomer", selected_id, first_name, last_name, email, phone, address)
                                     s.commit()
                                 st.toast("Customer details updated!")
                                 get_customers.clear()
@@ -231,9 +365,8 @@ with tab_customers:
                                 st.warning("All fields are required.")
                             else:
                                 try:
-                                    query = text("CALL sp_AddVehicle(:id, :make, :model, :year, :vin);")
                                     with conn.session as s:
-                                        s.execute(query, {"id": selected_cust_id, "make": make, "model": model, "year": int(year), "vin": vin})
+                                        db_backend.call_procedure(s, "sp_AddVehicle", selected_cust_id, make, model, int(year), vin)
                                         s.commit()
                                     st.toast("Vehicle added successfully!")
                                     get_vehicles.clear(selected_cust_id)
@@ -263,9 +396,8 @@ with tab_customers:
                                 submitted = st.form_submit_button("Save Vehicle Changes")
                                 if submitted:
                                     try:
-                                        query = text("CALL sp_UpdateVehicle(:id, :make, :model, :year, :vin);")
                                         with conn.session as s:
-                                            s.execute(query, {"id": selected_vehicle_id, "make": make, "model": model, "year": int(year), "vin": vin})
+                                            db_backend.call_procedure(s, "sp_UpdateVehicle", selected_vehicle_id, make, model, int(year), vin)
                                             s.commit()
                                         st.toast("Vehicle details updated!")
                                         get_vehicles.clear(selected_cust_id)
@@ -280,7 +412,7 @@ with tab_customers:
 with tab_bookings:
     st.header("Service Appointments (FR-15, FR-16, FR-17)")
     
-    sub_tab_b_new, sub_tab_b_view = st.tabs(["Book New Appointment", "View All Appointments"])
+    sub_tab_b_new, sub_tab_b_view, sub_tab_b_calendar = st.tabs(["Book New Appointment", "View All Appointments", "Mechanic Calendar"])
     
     def load_booking_data():
         data = {}
@@ -294,7 +426,9 @@ with tab_bookings:
     with sub_tab_b_new:
         st.subheader("Book a New Service Appointment")
         
-        with st.form("book_appointment_form", clear_on_submit=True, border=True):
+        # The token is part of the form key, so a second click on a render that already submitted is ignored.
+        book_token = submission_token("book_appointment")
+        with st.form(f"book_appointment_form_{book_token}", clear_on_submit=True, border=True):
             customer_list = list(booking_data["customers"].itertuples(index=False, name=None))
             selected_customer_tuple = st.selectbox(
                 "Select Customer",
@@ -351,45 +485,32 @@ with tab_bookings:
                 else:
                     try:
                         appointment_datetime = datetime.datetime.combine(appt_date, appt_time)
-                        query = text("CALL sp_BookAppointment(:cid, :vid, :mid, :sid, :date, :duration);")
-                        with conn.session as s:
-                            s.execute(query, {
-                                "cid": selected_customer_tuple[0],
-                                "vid": selected_vehicle_tuple[0],
-                                "mid": selected_mechanic_tuple[0],
-                                "sid": selected_service_tuple[0],
-                                "date": appointment_datetime,
-                                "duration": int(duration)
-                            })
-                            s.commit()
-                        st.toast("Appointment booked successfully!")
-                        get_appointments.clear()
-                        st.rerun() 
+                        submit_write("book_appointment", {
+                            "customer_id": int(selected_customer_tuple[0]),
+                            "vehicle_id": int(selected_vehicle_tuple[0]),
+                            "mechanic_id": int(selected_mechanic_tuple[0]),
+                            "service_id": int(selected_service_tuple[0]),
+                            "date": appointment_datetime.isoformat(),
+                            "duration": int(duration)
+                        }, f"Appointment for {selected_customer_tuple[1]} {selected_customer_tuple[2]}", "book_appointment", book_token)
+                        st.toast("Appointment submitted.")
                     except Exception as e:
                         st.error(f"Error booking appointment: {e}")
 
     with sub_tab_b_view:
         st.subheader("All Scheduled Appointments")
 
-        def update_status(appt_id, new_status):
+        def update_status(appt_id, new_status, token):
             try:
-                query = text("CALL sp_UpdateAppointmentStatus(:id, :status);")
-                with conn.session as s:
-                    s.execute(query, {"id": appt_id, "status": new_status})
-                    s.commit()
-                st.toast(f"Status updated for Appointment {appt_id}")
-                get_appointments.clear() 
+                submit_write("update_appointment_status", {"appointment_id": int(appt_id), "status": new_status},
+                             f"Status update for Appointment {appt_id}", f"appointment_{appt_id}", token)
             except Exception as e:
                 st.error(f"Error updating status: {e}")
 
-        def cancel_appointment(appt_id):
+        def cancel_appointment(appt_id, token):
             try:
-                query = text("CALL sp_CancelAppointment(:id);")
-                with conn.session as s:
-                    s.execute(query, {"id": appt_id})
-                    s.commit()
-                st.toast(f"Appointment {appt_id} cancelled.")
-                get_appointments.clear()
+                submit_write("cancel_appointment", {"appointment_id": int(appt_id)}, f"Cancellation of Appointment {appt_id}",
+                             f"appointment_{appt_id}", token)
             except Exception as e:
                 st.error(f"Error cancelling appointment: {e}")
 
@@ -420,22 +541,80 @@ with tab_bookings:
                                 index=current_status_index,
                                 key=f"status_{row['AppointmentID']}"
                             )
+                            appt_token = submission_token(f"appointment_{row['AppointmentID']}")
                             st.button(
                                 "Save Status", 
                                 key=f"save_status_{row['AppointmentID']}",
                                 on_click=update_status,
-                                args=(row['AppointmentID'], new_status)
+                                args=(row['AppointmentID'], new_status, appt_token)
                             )
                             st.button(
                                 "Cancel Appointment", 
                                 type="primary",
                                 key=f"cancel_{row['AppointmentID']}",
                                 on_click=cancel_appointment,
-                                args=(row['AppointmentID'],)
+                                args=(row['AppointmentID'], appt_token)
                             )
         except Exception as e:
             st.error(f"Error fetching appointments: {e}")
 
+    with sub_tab_b_calendar:
+        st.subheader("Mechanic Calendar and Utilization")
+
+        today = datetime.date.today()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            cal_range = st.date_input(
+                "Date Range",
+                value=(today - datetime.timedelta(days=today.weekday()), today + datetime.timedelta(days=6 - today.weekday())),
+                key="calendar_range"
+            )
+        with col2:
+            shift_start = st.time_input("Shift Start", value=datetime.time(9, 0), key="calendar_shift_start")
+        with col3:
+            shift_end = st.time_input("Shift End", value=datetime.time(17, 0), key="calendar_shift_end")
+        with col4:
+            granularity = st.radio("View By", ["Day", "Hour"], horizontal=True, key="calendar_granularity")
+
+        shift_minutes = (datetime.datetime.combine(today, shift_end) - datetime.datetime.combine(today, shift_start)).total_seconds() / 60
+
+        if len(cal_range) != 2:
+            st.info("Select a start and end date.")
+        elif shift_minutes <= 0:
+            st.warning("Shift End must be after Shift Start.")
+        else:
+            range_start = datetime.datetime.combine(cal_range[0], datetime.time.min)
+            range_end = datetime.datetime.combine(cal_range[1] + datetime.timedelta(days=1), datetime.time.min)
+            try:
+                range_df = get_appointments_in_range(range_start, range_end)
+                mechanics_df = get_mechanics()
+
+                utilization_df = scheduling.daily_utilization(range_df, mechanics_df, range_start, range_end, shift_start, shift_end)
+
+                m1, m2, m3 = st.columns(3)
+                m1.metric("Appointments", len(range_df))
+                m2.metric("Booked Hours in Shift", f"{(utilization_df * shift_minutes).to_numpy().sum() / 60:.1f}")
+                m3.metric("Overall Utilization", f"{utilization_df.to_numpy().mean():.0%}" if not utilization_df.empty else "0%")
+
+                st.write("**Utilization per Mechanic**")
+                st.bar_chart(utilization_df.mean(axis=1))
+
+                if granularity == "Day":
+                    st.write("**Share of Shift Booked**")
+                    st.dataframe(utilization_df.style.format("{:.0%}"), use_container_width=True)
+                else:
+                    st.write("**Booked Minutes per Hour (within shift)**")
+                    st.dataframe(scheduling.hourly_load(range_df, mechanics_df, range_start, range_end, shift_start, shift_end).style.format("{:.0f}"), use_container_width=True)
+
+                st.write("**Idle Gaps Within Shift**")
+                gaps_df = scheduling.idle_gaps(range_df, mechanics_df, range_start, range_end, shift_start, shift_end)
+                if gaps_df.empty:
+                    st.info("No idle gaps in the selected range.")
+                else:
+                    st.dataframe(gaps_df, use_container_width=True)
+            except Exception as e:
+                st.error(f"Error building mechanic calendar: {e}")
+
 
 # --- TAB 3: SHOP (Orders & Parts) ---
 with tab_shop:
@@ -469,15 +648,11 @@ with tab_shop:
                 
                 if add_to_cart:
                     if selected_part_tuple:
-                        if quantity > selected_part_tuple[4]:
-                            st.warning("Cannot add more than available stock.")
+                        in_cart = sum(item["Quantity"] for item in st.session_state.cart if item["PartID"] == selected_part_tuple[0])
+                        if in_cart + quantity > selected_part_tuple[4]:
+                            st.warning(f"Cannot add more than available stock ({selected_part_tuple[4]} in stock, {in_cart} already in cart).")
                         else:
-                            st.session_state.cart.append({
-                                "PartID": selected_part_tuple[0],
-                                "PartName": selected_part_tuple[1],
-                                "Quantity": quantity,
-                                "Price": selected_part_tuple[3]
-                            })
+                            add_cart_item(st.session_state.cart, selected_part_tuple[0], selected_part_tuple[1], quantity, selected_part_tuple[3])
                             st.toast(f"Added {quantity}x {selected_part_tuple[1]} to cart.")
                             # No rerun here, cart updates on its own
 
@@ -508,63 +683,57 @@ with tab_shop:
                 
                 st.subheader(f"Cart Total: ${cart_total:.2f}")
                 
-                with st.form("place_order_form", border=True):
+                def place_order(token):
+                    # Runs as the submit callback, before the page is drawn, so the cart moved into
+                    # the pending order is already gone from this run and cannot be submitted twice.
+                    # It is restored if the order fails.
+                    selected_customer_tuple = st.session_state.order_customer_select
+                    if not selected_customer_tuple:
+                        st.warning("Please select a customer.")
+                    elif not st.session_state.cart:
+                        st.warning("Your cart is empty.")
+                    else:
+                        try:
+                            shortages, price_changes = check_cart(st.session_state.cart)
+                        except Exception as e:
+                            shortages, price_changes = [f"Could not check stock: {e}"], []
+                        if shortages:
+                            st.error("Cannot place order:\n" + "\n".join(f"- {msg}" for msg in shortages))
+                            get_parts.clear()
+                        elif price_changes:
+                            st.warning("Prices changed since these parts were added. Review the cart and place the order again:\n" + "\n".join(f"- {msg}" for msg in price_changes))
+                        else:
+                            try:
+                                submit_write("place_order", {
+                                    "customer_id": int(selected_customer_tuple[0]),
+                                    "items": [{"part_id": int(item['PartID']), "quantity": int(item['Quantity'])} for item in st.session_state.cart]
+                                }, f"Order for {selected_customer_tuple[1]} {selected_customer_tuple[2]}", "place_order", token,
+                                   cart=st.session_state.cart)
+                                st.session_state.cart = []
+                                st.toast("Order submitted.")
+                            except Exception as e:
+                                st.error(f"Error placing order: {e}")
+
+                order_token = submission_token("place_order")
+                with st.form(f"place_order_form_{order_token}", border=True):
                     customers_df = get_customers()
                     customer_list = list(customers_df.itertuples(index=False, name=None))
-                    selected_customer_tuple = st.selectbox(
+                    st.selectbox(
                         "Select Customer for this Order",
                         customer_list,
                         format_func=lambda x: f"{x[1]} {x[2]} (ID: {x[0]})",
                         key="order_customer_select"
                     )
                     
-                    place_order = st.form_submit_button("Place Order")
-                    
-                    if place_order:
-                        if not selected_customer_tuple:
-                            st.warning("Please select a customer.")
-                        elif not st.session_state.cart:
-                            st.warning("Your cart is empty.")
-                        else:
-                            try:
-                                with conn.session as s:
-                                    query_create_order = text("CALL sp_CreateOrder(:cid, @new_order_id);")
-                                    s.execute(query_create_order, {"cid": selected_customer_tuple[0]})
-                                    new_order_id = s.execute(text("SELECT @new_order_id;")).scalar()
-                                    
-                                    if new_order_id:
-                                        for item in st.session_state.cart:
-                                            query_add_item = text("CALL sp_AddOrderItem(:oid, :pid, :qty);")
-                                            s.execute(query_add_item, {
-                                                "oid": new_order_id,
-                                                "pid": item['PartID'],
-                                                "qty": item['Quantity']
-                                            })
-                                        s.commit()
-                                        st.session_state.cart = []
-                                        st.success(f"Order #{new_order_id} placed successfully!")
-                                        
-                                        get_orders.clear()
-                                        get_parts.clear()
-                                        get_order_items.clear_cache() # Clear all order item caches
-                                        st.rerun() 
-                                    else:
-                                        st.error("Failed to create order.")
-                            except Exception as e:
-                                st.error(f"Error placing order: {e}")
-                                st.info("This is likely due to the 'trg_CheckStockBeforeOrder' trigger. Stock may have changed.")
+                    st.form_submit_button("Place Order", on_click=place_order, args=(order_token,))
 
     with sub_tab_s_view:
         st.subheader("All Placed Orders")
         
-        def update_order_status(order_id, new_status):
+        def update_order_status(order_id, new_status, token):
             try:
-                query = text("CALL sp_UpdateOrderStatus(:id, :status);")
-                with conn.session as s:
-                    s.execute(query, {"id": order_id, "status": new_status})
-                    s.commit()
-                st.toast(f"Status updated for Order {order_id}")
-                get_orders.clear()
+                submit_write("update_order_status", {"order_id": int(order_id), "status": new_status},
+                             f"Status update for Order {order_id}", f"order_{order_id}", token)
             except Exception as e:
                 st.error(f"Error updating status: {e}")
         
@@ -598,7 +767,7 @@ with tab_shop:
                                 "Save Order Status", 
                                 key=f"save_order_status_{row['OrderID']}",
                                 on_click=update_order_status,
-                                args=(row['OrderID'], new_status)
+                                args=(row['OrderID'], new_status, submission_token(f"order_{row['OrderID']}"))
                             )
 
         except Exception as e:
@@ -656,9 +825,8 @@ with tab_admin:
                         st.warning("First Name and Last Name are required.")
                     else:
                         try:
-                            query = text("CALL sp_AddMechanic(:fname, :lname, :spec);")
                             with conn.session as s:
-                                s.execute(query, {"fname": first_name, "lname": last_name, "spec": specialization})
+                                db_backend.call_procedure(s, "sp_AddMechanic", first_name, last_name, specialization)
                                 s.commit()
                             st.toast(f"Added new mechanic: {first_name} {last_name}")
                             get_mechanics.clear()
@@ -701,15 +869,13 @@ with tab_admin:
                 if submitted:
                     try:
                         if is_new:
-                            query = text("CALL sp_AddService(:name, :desc, :cost);")
                             with conn.session as s:
-                                s.execute(query, {"name": name, "desc": desc, "cost": cost})
+                                db_backend.call_procedure(s, "sp_AddService", name, desc, cost)
                                 s.commit()
                             st.toast("Service added!")
                         else:
-                            query = text("CALL sp_UpdateService(:id, :name, :desc, :cost);")
                             with conn.session as s:
-                                s.execute(query, {"id": selected_service_tuple[0], "name": name, "desc": desc, "cost": cost})
+                                db_backend.call_procedure(s, "sp_UpdateService", selected_service_tuple[0], name, desc, cost)
                                 s.commit()
                             st.toast("Service updated!")
                         get_services.clear()
@@ -753,18 +919,19 @@ with tab_admin:
                 if submitted:
                     try:
                         if is_new:
-                            query = text("CALL sp_AddPart(:name, :mfg, :price, :stock);")
                             with conn.session as s:
-                                s.execute(query, {"name": name, "mfg": mfg, "price": price, "stock": stock})
+                                db_backend.call_procedure(s, "sp_AddPart", name, mfg, price, stock)
                                 s.commit()
                             st.toast("Part added!")
                         else:
-                            query = text("CALL sp_UpdatePart(:id, :name, :mfg, :price, :stock);")
                             with conn.session as s:
-                                s.execute(query, {"id": selected_part_tuple[0], "name": name, "mfg": mfg, "price": price, "stock": stock})
+                                db_backend.call_procedure(s, "sp_UpdatePart", selected_part_tuple[0], name, mfg, price, stock)
                                 s.commit()
                             st.toast("Part updated!")
                         get_parts.clear()
                         st.rerun() 
                     except Exception as e:
-                        st.error(f"Error saving part: {e}")
\ No newline at end of file
+                        st.error(f"Error saving part: {e}")
+
+# Set last, so background-write polling only forces a rerun once this run has finished.
+st.session_state.write_poll_can_rerun = True
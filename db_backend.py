@@ -0,0 +1,402 @@
+"""Database backend helpers shared by app.py and loadtest.py.
+
+The app normally runs against MySQL with the stored procedures and triggers
+from Project.sql. Pointing the ``autoservicedb`` connection at a SQLite URL
+instead (``url = "sqlite:///autoservicedb.sqlite"`` in secrets.toml) selects
+an offline, in-process backend: ``install_sqlite`` creates the same tables
+and triggers on first use, and ``call_procedure`` runs Python
+emulations of the ``sp_*`` procedures instead of ``CALL`` statements.
+"""
+import datetime
+import re
+import sqlite3
+import weakref
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# --- PROCEDURE CALLS ---
+def _dialect_name(s):
+    bind = s.get_bind() if isinstance(s, Session) else s
+    return bind.dialect.name
+
+
+def call_procedure(s, name, *args):
+    """Run stored procedure ``name`` with positional IN arguments on session/connection ``s``.
+
+    Returns whatever the procedure produces on SQLite (e.g. the new OrderID
+    for sp_CreateOrder); on MySQL use ``create_order`` for procedures with OUT
+    parameters.
+    """
+    if _dialect_name(s) == "sqlite":
+        return SQLITE_PROCEDURES[name](s, *args)
+    params = {f"p{i}": value for i, value in enumerate(args)}
+    placeholders = ", ".join(f":{key}" for key in params)
+    s.execute(text(f"CALL {name}({placeholders});"), params)
+
+
+def create_order(s, customer_id):
+    """Call sp_CreateOrder and return the new OrderID."""
+    if _dialect_name(s) == "sqlite":
+        return call_procedure(s, "sp_CreateOrder", customer_id)
+    s.execute(text("CALL sp_CreateOrder(:cid, @new_order_id);"), {"cid": customer_id})
+    return s.execute(text("SELECT @new_order_id;")).scalar()
+
+
+# --- SQLITE STORED PROCEDURE EMULATION ---
+def _sp_add_mechanic(s, first_name, last_name, specialization):
+    s.execute(text("INSERT INTO mechanics (FirstName, LastName, Specialization) VALUES (:f, :l, :s);"),
+              {"f": first_name, "l": last_name, "s": specialization})
+
+
+def _sp_add_customer(s, first_name, last_name, email, phone, address):
+    s.execute(text("INSERT INTO customers (FirstName, LastName, Email, Phone, Address) VALUES (:f, :l, :e, :p, :a);"),
+              {"f": first_name, "l": last_name, "e": email, "p": phone, "a": address})
+
+
+def _sp_update_customer(s, customer_id, first_name, last_name, email, phone, address):
+    s.execute(text("""
+        UPDATE customers
+        SET FirstName = :f, LastName = :l, Email = :e, Phone = :p, Address = :a
+        WHERE CustomerID = :id;
+    """), {"id": customer_id, "f": first_name, "l": last_name, "e": email, "p": phone, "a": address})
+
+
+def _sp_add_vehicle(s, customer_id, make, model, year, vin):
+    s.execute(text("INSERT INTO vehicles (CustomerID, Make, Model, Year, VIN) VALUES (:c, :mk, :md, :y, :v);"),
+              {"c": customer_id, "mk": make, "md": model, "y": year, "v": vin})
+
+
+def _sp_update_vehicle(s, vehicle_id, make, model, year, vin):
+    s.execute(text("UPDATE vehicles SET Make = :mk, Model = :md, Year = :y, VIN = :v WHERE VehicleID = :id;"),
+              {"id": vehicle_id, "mk": make, "md": model, "y": year, "v": vin})
+
+
+def _sp_add_service(s, name, description, cost):
+    s.execute(text("INSERT INTO services (ServiceName, Description, StandardCost) VALUES (:n, :d, :c);"),
+              {"n": name, "d": description, "c": cost})
+
+
+def _sp_update_service(s, service_id, name, description, cost):
+    s.execute(text("UPDATE services SET ServiceName = :n, Description = :d, StandardCost = :c WHERE ServiceID = :id;"),
+              {"id": service_id, "n": name, "d": description, "c": cost})
+
+
+def _sp_add_part(s, name, manufacturer, price, stock):
+    s.execute(text("INSERT INTO parts (PartName, Manufacturer, Price, StockQuantity) VALUES (:n, :m, :p, :q);"),
+              {"n": name, "m": manufacturer, "p": price, "q": stock})
+
+
+def _sp_update_part(s, part_id, name, manufacturer, price, stock):
+    s.execute(text("""
+        UPDATE parts
+        SET PartName = :n, Manufacturer = :m, Price = :p, StockQuantity = :q
+        WHERE PartID = :id;
+    """), {"id": part_id, "n": name, "m": manufacturer, "p": price, "q": stock})
+
+
+def _sp_book_appointment(s, customer_id, vehicle_id, mechanic_id, service_id, appointment_date, duration):
+    s.execute(text("""
+        INSERT INTO serviceappointments (CustomerID, VehicleID, MechanicID, ServiceID, AppointmentDate, DurationMinutes)
+        VALUES (:c, :v, :m, :s, :d, :dur);
+    """), {"c": customer_id, "v": vehicle_id, "m": mechanic_id, "s": service_id, "d": appointment_date, "dur": duration})
+
+
+def _sp_update_appointment_status(s, appointment_id, status):
+    s.execute(text("UPDATE serviceappointments SET Status = :st WHERE AppointmentID = :id;"),
+              {"id": appointment_id, "st": status})
+
+
+def _sp_cancel_appointment(s, appointment_id):
+    s.execute(text("DELETE FROM serviceappointments WHERE AppointmentID = :id;"), {"id": appointment_id})
+
+
+def _sp_create_order(s, customer_id):
+    s.execute(text("INSERT INTO orders (CustomerID) VALUES (:c);"), {"c": customer_id})
+    return s.execute(text("SELECT last_insert_rowid();")).scalar()
+
+
+def _sp_add_order_item(s, order_id, part_id, quantity):
+    # Snapshot the current price, exactly like the MySQL procedure.
+    price = s.execute(text("SELECT Price FROM parts WHERE PartID = :id;"), {"id": part_id}).scalar()
+    s.execute(text("INSERT INTO orderitems (OrderID, PartID, Quantity, UnitPrice) VALUES (:o, :p, :q, :u);"),
+              {"o": order_id, "p": part_id, "q": quantity, "u": price})
+
+
+def _sp_update_order_status(s, order_id, status):
+    s.execute(text("UPDATE orders SET Status = :st WHERE OrderID = :id;"), {"id": order_id, "st": status})
+
+
+SQLITE_PROCEDURES = {
+    "sp_AddMechanic": _sp_add_mechanic,
+    "sp_AddCustomer": _sp_add_customer,
+    "sp_UpdateCustomer": _sp_update_customer,
+    "sp_AddVehicle": _sp_add_vehicle,
+    "sp_UpdateVehicle": _sp_update_vehicle,
+    "sp_AddService": _sp_add_service,
+    "sp_UpdateService": _sp_update_service,
+    "sp_AddPart": _sp_add_part,
+    "sp_UpdatePart": _sp_update_part,
+    "sp_BookAppointment": _sp_book_appointment,
+    "sp_UpdateAppointmentStatus": _sp_update_appointment_status,
+    "sp_CancelAppointment": _sp_cancel_appointment,
+    "sp_CreateOrder": _sp_create_order,
+    "sp_AddOrderItem": _sp_add_order_item,
+    "sp_UpdateOrderStatus": _sp_update_order_status,
+}
+
+
+# --- SQLITE SCHEMA ---
+# Same tables, index and sample rows as Project.sql, translated to SQLite.
+SQLITE_SCHEMA = """
+CREATE TABLE customers (
+    CustomerID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FirstName VARCHAR(50) NOT NULL,
+    LastName VARCHAR(50) NOT NULL,
+    Email VARCHAR(100) UNIQUE NOT NULL,
+    Phone VARCHAR(15),
+    Address VARCHAR(255)
+);
+
+CREATE TABLE mechanics (
+    MechanicID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FirstName VARCHAR(50) NOT NULL,
+    LastName VARCHAR(50) NOT NULL,
+    Specialization VARCHAR(100)
+);
+
+CREATE TABLE services (
+    ServiceID INTEGER PRIMARY KEY AUTOINCREMENT,
+    ServiceName VARCHAR(100) NOT NULL,
+    Description TEXT,
+    StandardCost DECIMAL(10, 2) NOT NULL CHECK (StandardCost >= 0)
+);
+
+CREATE TABLE parts (
+    PartID INTEGER PRIMARY KEY AUTOINCREMENT,
+    PartName VARCHAR(100) NOT NULL,
+    Manufacturer VARCHAR(100),
+    Price DECIMAL(10, 2) NOT NULL CHECK (Price >= 0),
+    StockQuantity INT NOT NULL DEFAULT 0 CHECK (StockQuantity >= 0)
+);
+
+CREATE TABLE vehicles (
+    VehicleID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerID INT NOT NULL,
+    Make VARCHAR(50),
+    Model VARCHAR(50),
+    Year INT,
+    VIN VARCHAR(17) UNIQUE,
+    FOREIGN KEY (CustomerID) REFERENCES customers(CustomerID) ON DELETE CASCADE
+);
+
+CREATE TABLE orders (
+    OrderID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerID INT NOT NULL,
+    OrderDate DATE NOT NULL DEFAULT (CURRENT_DATE),
+    TotalAmount DECIMAL(10, 2) DEFAULT 0.00,
+    Status VARCHAR(20) DEFAULT 'Pending',
+    FOREIGN KEY (CustomerID) REFERENCES customers(CustomerID)
+);
+
+CREATE TABLE serviceappointments (
+    AppointmentID INTEGER PRIMARY KEY AUTOINCREMENT,
+    CustomerID INT NOT NULL,
+    VehicleID INT NOT NULL,
+    MechanicID INT NOT NULL,
+    ServiceID INT NOT NULL,
+    AppointmentDate DATETIME NOT NULL,
+    Status VARCHAR(20) DEFAULT 'Scheduled',
+    DurationMinutes INT DEFAULT 60,
+    FOREIGN KEY (CustomerID) REFERENCES customers(CustomerID),
+    FOREIGN KEY (VehicleID) REFERENCES vehicles(VehicleID),
+    FOREIGN KEY (MechanicID) REFERENCES mechanics(MechanicID),
+    FOREIGN KEY (ServiceID) REFERENCES services(ServiceID)
+);
+
+CREATE TABLE orderitems (
+    OrderItemID INTEGER PRIMARY KEY AUTOINCREMENT,
+    OrderID INT NOT NULL,
+    PartID INT NOT NULL,
+    Quantity INT NOT NULL CHECK (Quantity > 0),
+    UnitPrice DECIMAL(10, 2),
+    FOREIGN KEY (OrderID) REFERENCES orders(OrderID),
+    FOREIGN KEY (PartID) REFERENCES parts(PartID)
+);
+
+CREATE INDEX idx_appointments_date_mechanic ON serviceappointments (AppointmentDate, MechanicID);
+"""
+
+# Created after the sample data, matching the section order of Project.sql, so
+# the seed orders keep stock and TotalAmount untouched exactly as in MySQL.
+SQLITE_TRIGGERS = """
+-- --- Triggers (same names and messages as Project.sql) --- --
+CREATE TRIGGER trg_CheckMechanicName
+BEFORE INSERT ON mechanics
+FOR EACH ROW
+WHEN NEW.FirstName REGEXP '[0-9]' OR NEW.LastName REGEXP '[0-9]'
+BEGIN
+    SELECT RAISE(ABORT, 'Error: Mechanic name cannot contain numbers.');
+END;
+
+CREATE TRIGGER trg_CheckStockBeforeOrder
+BEFORE INSERT ON orderitems
+FOR EACH ROW
+WHEN (SELECT StockQuantity FROM parts WHERE PartID = NEW.PartID) < NEW.Quantity
+BEGIN
+    SELECT RAISE(ABORT, 'Error: Insufficient stock for this item.');
+END;
+
+CREATE TRIGGER trg_UpdateStockAfterOrder
+AFTER INSERT ON orderitems
+FOR EACH ROW
+BEGIN
+    UPDATE parts
+    SET StockQuantity = StockQuantity - NEW.Quantity
+    WHERE PartID = NEW.PartID;
+END;
+
+CREATE TRIGGER trg_UpdateOrderTotal
+AFTER INSERT ON orderitems
+FOR EACH ROW
+BEGIN
+    UPDATE orders
+    SET TotalAmount = TotalAmount + (NEW.Quantity * NEW.UnitPrice)
+    WHERE OrderID = NEW.OrderID;
+END;
+"""
+
+# Added after the original schema, so it is also created on existing SQLite files.
+SQLITE_APPLIED_WRITES = """
+CREATE TABLE IF NOT EXISTS appliedwrites (
+    IdempotencyKey VARCHAR(64) PRIMARY KEY,
+    ResultID INT,
+    AppliedAt DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+SQLITE_SAMPLE_DATA = """
+INSERT INTO customers (FirstName, LastName, Email, Phone, Address) VALUES
+('Alice', 'Smith', 'alice.smith@email.com', '555-0101', '123 Main St, Anytown'),
+('Bob', 'Johnson', 'bob.johnson@email.com', '555-0102', '456 Oak Ave, Sometown'),
+('Charlie', 'Brown', 'charlie.b@email.com', '555-0103', '789 Pine Ln, Yourtown');
+
+INSERT INTO mechanics (FirstName, LastName, Specialization) VALUES
+('Carlos', 'Ray', 'Engine Specialist'),
+('Diana', 'Prince', 'Tires and Brakes'),
+('Evan', 'Wright', 'General Maintenance');
+
+INSERT INTO services (ServiceName, Description, StandardCost) VALUES
+('Standard Oil Change', 'Includes up to 5 quarts of conventional oil and a new filter.', 49.99),
+('Brake Inspection', 'Inspect front and rear brake systems for wear and tear.', 25.00),
+('Tire Rotation', 'Rotate all four tires to ensure even tread wear.', 19.95),
+('Engine Diagnostic', 'Full computer diagnostic scan to identify check engine light causes.', 99.50);
+
+INSERT INTO parts (PartName, Manufacturer, Price, StockQuantity) VALUES
+('Oil Filter', 'AutoPartsCo', 15.00, 150),
+('Brake Pads (Set)', 'StopWell', 75.50, 80),
+('Wiper Blade (Pair)', 'ClearView', 22.00, 120),
+('Air Filter', 'BreatheEasy', 18.50, 200),
+('Spark Plug', 'IgniteCo', 8.75, 500);
+
+INSERT INTO vehicles (CustomerID, Make, Model, Year, VIN) VALUES
+(1, 'Toyota', 'Camry', 2018, 'VIN123456789ABC'),
+(1, 'Ford', 'F-150', 2020, 'VIN23456789ABCD'),
+(2, 'Honda', 'Civic', 2021, 'VIN987654321XYZ');
+
+INSERT INTO orders (CustomerID, OrderDate, Status) VALUES
+(1, '2025-10-28', 'Shipped'),
+(2, '2025-11-03', 'Pending');
+
+INSERT INTO orderitems (OrderID, PartID, Quantity, UnitPrice) VALUES
+(1, 1, 1, 15.00),
+(1, 3, 1, 22.00),
+(2, 5, 4, 8.75);
+
+INSERT INTO serviceappointments (CustomerID, VehicleID, MechanicID, ServiceID, AppointmentDate, DurationMinutes) VALUES
+(1, 1, 3, 1, '2025-11-10 09:00:00', 45),
+(2, 3, 2, 2, '2025-11-11 14:00:00', 60),
+(1, 2, 1, 4, '2025-11-12 10:30:00', 90);
+"""
+
+
+# --- SQLITE ENGINE SETUP ---
+def _concat(*args):
+    # MySQL CONCAT returns NULL if any argument is NULL.
+    if any(a is None for a in args):
+        return None
+    return "".join(str(a) for a in args)
+
+
+def _regexp(pattern, value):
+    return value is not None and re.search(pattern, str(value)) is not None
+
+
+def _get_mechanic_details(first_name, last_name, specialization):
+    return _concat(first_name, " ", last_name, " (", specialization, ")")
+
+
+def _on_connect(dbapi_connection, connection_record):
+    dbapi_connection.create_function("CONCAT", -1, _concat, deterministic=True)
+    dbapi_connection.create_function("REGEXP", 2, _regexp, deterministic=True)
+    dbapi_connection.create_function("fn_GetMechanicDetails", 3, _get_mechanic_details, deterministic=True)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON;")
+    cursor.execute("PRAGMA journal_mode = WAL;")
+    cursor.execute("PRAGMA busy_timeout = 5000;")
+    cursor.close()
+
+
+def _on_do_connect(dialect, connection_record, cargs, cparams):
+    # Return DATE/DATETIME columns as date/datetime objects, like mysqlclient does.
+    cparams.setdefault("detect_types", sqlite3.PARSE_DECLTYPES)
+
+
+def _register_sqlite_types():
+    sqlite3.register_adapter(datetime.datetime, lambda v: v.strftime("%Y-%m-%d %H:%M:%S"))
+    sqlite3.register_adapter(datetime.date, lambda v: v.isoformat())
+    sqlite3.register_converter("DATETIME", lambda b: datetime.datetime.fromisoformat(b.decode()))
+    sqlite3.register_converter("DATE", lambda b: datetime.date.fromisoformat(b.decode()))
+
+
+_installed_engines = weakref.WeakSet()
+
+
+def install_sqlite(engine):
+    """Prepare a SQLite engine for the app and create the schema if it is missing.
+
+    Safe to call on every rerun; engines that are already set up are skipped.
+    Must run before the engine opens its first connection.
+    """
+    if engine in _installed_engines:
+        return
+    _register_sqlite_types()
+    event.listen(engine, "do_connect", _on_do_connect)
+    event.listen(engine, "connect", _on_connect)
+    _installed_engines.add(engine)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.driver_connection.cursor()
+        # Take the write lock first so concurrent first runs cannot both create the schema.
+        cursor.execute("BEGIN IMMEDIATE;")
+        exists = cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'customers';").fetchone()
+        if not exists:
+            for statement in _split_statements(SQLITE_SCHEMA + SQLITE_SAMPLE_DATA + SQLITE_TRIGGERS):
+                cursor.execute(statement)
+        cursor.execute(SQLITE_APPLIED_WRITES)
+        raw.driver_connection.commit()
+    finally:
+        raw.close()
+
+
+def _split_statements(script):
+    statements, current = [], ""
+    for line in script.splitlines(keepends=True):
+        if line.lstrip().startswith("--"):
+            continue
+        current += line
+        if sqlite3.complete_statement(current):
+            statements.append(current.strip())
+            current = ""
+    return statements
@@ -0,0 +1,387 @@
+"""Headless load test for the Auto Service Management app.
+
+Drives ``app.py`` through Streamlit's ``AppTest`` the way a counter clerk
+would (browse appointments, book an appointment, add a part to the cart and
+place the order, update an appointment status) and runs many such sessions
+at once against a locally seeded database.
+
+Write interactions (booking, placing an order, saving a status) are timed
+until the background write queue has applied them, by rerunning the app the
+way its polling fragment would until nothing is left pending; a failed write
+counts as an error with the message shown to the clerk.
+
+Every session runs in its own worker process: ``AppTest`` swaps global
+Streamlit state (runtime, secrets) on each run, so sessions cannot safely
+share a process. Each worker therefore has its own ``st.cache_data`` caches,
+which makes the reported queries-per-interaction an upper bound for a real
+single-server deployment where sessions share those caches.
+
+Usage:
+    python loadtest.py --seed                      # seed the configured DB once
+    python loadtest.py --sessions 20 --iterations 5
+    python loadtest.py --url "mysql://user:pw@localhost/AUTOSERVICEDB" --json report.json
+    python loadtest.py --url sqlite:///loadtest.sqlite --seed   # offline SQLite backend
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+import threading
+import tomllib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import sqlalchemy
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+
+import db_backend
+import write_queue
+
+APP_DIR = Path(__file__).resolve().parent
+APP_PATH = APP_DIR / "app.py"
+SECRETS_PATH = APP_DIR / ".streamlit" / "secrets.toml"
+CONNECTION_NAME = "autoservicedb"
+
+SEED_FIRST_NAME = "Load"
+APPOINTMENT_STATUSES = ["Scheduled", "Completed", "Cancelled", "In Progress"]
+WRITE_POLL_SECONDS = 0.05
+
+
+# --- CONFIGURATION ---
+def resolve_url(url=None):
+    """Return the SQLAlchemy URL to test against, defaulting to secrets.toml."""
+    if url:
+        return url
+    with open(SECRETS_PATH, "rb") as f:
+        params = tomllib.load(f)["connections"][CONNECTION_NAME]
+    if "url" in params:
+        return params["url"]
+    drivername = params["dialect"] + (f"+{params['driver']}" if "driver" in params else "")
+    return sqlalchemy.engine.URL.create(
+        drivername=drivername,
+        username=params.get("username"),
+        password=params.get("password"),
+        host=params.get("host"),
+        port=int(params["port"]) if "port" in params else None,
+        database=params.get("database"),
+    ).render_as_string(hide_password=False)
+
+
+# --- SEEDING ---
+def seed_database(url, customers=50, mechanics=10, parts=25):
+    """Insert load-test customers, vehicles, mechanics and well-stocked parts.
+
+    Rows go through the same stored procedures the app calls (or their
+    SQLite emulation), so the triggers behind them fire exactly as they do
+    in production.
+    """
+    run_tag = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    engine = sqlalchemy.create_engine(url)
+    if engine.dialect.name == "sqlite":
+        db_backend.install_sqlite(engine)
+    with engine.begin() as c:
+        for i in range(customers):
+            db_backend.call_procedure(
+                c, "sp_AddCustomer",
+                SEED_FIRST_NAME, f"Clerk{i}", f"loadtest-{run_tag}-{i}@example.com", f"555-{i:04d}", f"{i} Benchmark Rd",
+            )
+            customer_id = c.execute(text("SELECT MAX(CustomerID) FROM customers;")).scalar()
+            db_backend.call_procedure(
+                c, "sp_AddVehicle",
+                customer_id, "Toyota", "Corolla", 2015 + i % 10, f"LT{run_tag[-9:]}{i:06d}"[:17],
+            )
+        for i in range(mechanics):
+            # trg_CheckMechanicName rejects digits, so suffix with letters instead.
+            suffix = "".join(chr(ord("a") + int(d)) for d in str(i))
+            db_backend.call_procedure(c, "sp_AddMechanic", SEED_FIRST_NAME, f"Mechanic{suffix}", "General Maintenance")
+        for i in range(parts):
+            db_backend.call_procedure(c, "sp_AddPart", f"Load Test Part {i}", "BenchCo", round(5 + i * 1.25, 2), 1_000_000)
+    engine.dispose()
+
+
+# --- SESSION SCRIPT ---
+_query_count = 0
+_job_query_count = 0
+_job_query_lock = threading.Lock()
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Count statements of the app's script run and, separately, those write queue workers run for a job.
+
+    Queue housekeeping (the stale-job sweep) runs outside any job and is not counted.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    global _query_count, _job_query_count
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        _query_count += 1
+    elif write_queue.current_job_key() is not None:
+        with _job_query_lock:
+            _job_query_count += 1
+
+
+def _widget(widgets, label=None, key=None):
+    for w in widgets:
+        if (label is None or w.label == label) and (key is None or w.key == key):
+            return w
+    raise LookupError(f"Widget not found (label={label!r}, key={key!r})")
+
+
+def _select(box, prefer=lambda label: True):
+    """Pick a random option of ``box``, favouring labels that satisfy ``prefer``.
+
+    The app's selectboxes hold row tuples, and AppTest maps a chosen value
+    back to its index through the app's format_func, which expects a tuple.
+    Registering ``str`` as the formatter for this interaction lets the
+    displayed label map straight back to its index.
+
+    This relies on Streamlit internals (``TESTING_KEY`` and AppTest's
+    format_func registry); it is known to work with the streamlit==1.44.0
+    pinned in requirements.txt and may break on other versions.
+    """
+    from streamlit.runtime.state.common import TESTING_KEY
+
+    preferred = [label for label in box.options if prefer(label)]
+    box.root.session_state[TESTING_KEY][box.id] = str
+    box.set_value(random.choice(preferred or box.options))
+
+
+class _Session:
+    """One simulated clerk driving the app through ``AppTest``."""
+
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        self.timeout = timeout
+        self.samples = []
+
+    def _run(self):
+        self.at.run()
+        if self.at.exception:
+            return self.at.exception[0].message
+        if self.at.error:
+            return self.at.error[0].value
+        return None
+
+    def _wait_for_writes(self, timeout):
+        """Rerun until the queued writes are applied; failures surface as st.error from write_messages."""
+        deadline = time.perf_counter() + timeout
+        while self.at.session_state["pending_writes"]:
+            if time.perf_counter() > deadline:
+                return f"Writes still pending after {timeout:.0f}s"
+            time.sleep(WRITE_POLL_SECONDS)
+            error = self._run()
+            if error:
+                return error
+        return None
+
+    def step(self, name, prepare=None, writes=False):
+        error = None
+        queries_before = _query_count
+        job_queries_before = _job_query_count
+        queries = None
+        start = time.perf_counter()
+        try:
+            if prepare is not None:
+                prepare(self.at)
+            error = self._run()
+            # Polling reruns stand in for the app's timer fragment and are not counted. The
+            # write jobs' own statements are: this process runs a single session, so every
+            # job applied during the step was queued by it.
+            queries = _query_count - queries_before
+            if writes and not error:
+                error = self._wait_for_writes(self.timeout)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        if queries is None:
+            queries = _query_count - queries_before
+        queries += _job_query_count - job_queries_before
+        self.samples.append({
+            "interaction": name,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "queries": queries,
+            "error": error,
+        })
+        return error is None
+
+    def browse(self):
+        return self.step("browse")
+
+    def book_appointment(self):
+        def prepare(at):
+            _select(_widget(at.selectbox, key="book_customer_select"), lambda o: o.startswith(SEED_FIRST_NAME))
+            _select(_widget(at.selectbox, key="book_mechanic_select"))
+            _select(_widget(at.selectbox, key="book_service_select"))
+            _widget(at.time_input, label="Appointment Time").set_value(
+                datetime.time(random.randint(8, 17), random.choice([0, 15, 30, 45]))
+            )
+            _widget(at.button, label="Book Appointment").click()
+        return self.step("book_appointment", prepare, writes=True)
+
+    def add_to_cart(self):
+        def prepare(at):
+            _select(_widget(at.selectbox, label="Select Part"))
+            _widget(at.number_input, label="Quantity").set_value(random.randint(1, 3))
+            _widget(at.button, label="Add to Cart").click()
+        return self.step("add_to_cart", prepare)
+
+    def place_order(self):
+        def prepare(at):
+            _select(_widget(at.selectbox, key="order_customer_select"), lambda o: o.startswith(SEED_FIRST_NAME))
+            _widget(at.button, label="Place Order").click()
+        return self.step("place_order", prepare, writes=True)
+
+    def update_status(self):
+        status_boxes = [s for s in self.at.selectbox if s.key and s.key.startswith("status_")]
+        if not status_boxes:
+            return True
+        box = random.choice(status_boxes)
+        appointment_key = box.key.removeprefix("status_")
+        # Changing the selectbox reruns the app before the save button is clicked.
+        if not self.step("update_status_select", lambda at: box.set_value(random.choice(APPOINTMENT_STATUSES))):
+            return False
+        return self.step(
+            "update_status_save",
+            lambda at: _widget(at.button, key=f"save_status_{appointment_key}").click(),
+            writes=True,
+        )
+
+    def run_script(self, iterations):
+        self.browse()
+        for _ in range(iterations):
+            self.browse()
+            self.book_appointment()
+            if self.add_to_cart():
+                self.place_order()
+            self.update_status()
+        return self.samples
+
+
+def _point_app_at(url):
+    """Make the app's ``st.connection`` use ``url`` in this worker process.
+
+    ``AppTest.secrets`` only replaces ``st.secrets``; connections read the
+    secrets singleton, so hand it a throwaway secrets file instead.
+    """
+    import streamlit as st
+
+    fd, path = tempfile.mkstemp(suffix=".toml", prefix="loadtest-secrets-")
+    with os.fdopen(fd, "w") as f:
+        f.write(f"[connections.{CONNECTION_NAME}]\nurl = {json.dumps(url)}\n")
+    st.config.set_option("secrets.files", [path])
+    return path
+
+
+def run_session(session_id, url, iterations, timeout):
+    """Worker entry point: run one scripted clerk session and return its samples."""
+    os.chdir(APP_DIR)
+    random.seed(session_id)
+    event.listen(Engine, "before_cursor_execute", _count_query)
+    secrets_path = None
+    try:
+        secrets_path = _point_app_at(url)
+        return _Session(timeout).run_script(iterations)
+    except Exception:
+        return [{
+            "interaction": "session_setup",
+            "latency_ms": 0.0,
+            "queries": 0,
+            "error": traceback.format_exc(limit=3),
+        }]
+    finally:
+        if secrets_path:
+            os.remove(secrets_path)
+
+
+# --- REPORTING ---
+def _percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    groups = {}
+    for sample in samples:
+        groups.setdefault(sample["interaction"], []).append(sample)
+    groups["ALL"] = samples
+
+    report = {}
+    for name, group in groups.items():
+        latencies = [s["latency_ms"] for s in group]
+        errors = [s["error"] for s in group if s["error"]]
+        report[name] = {
+            "count": len(group),
+            "p50_ms": _percentile(latencies, 50),
+            "p90_ms": _percentile(latencies, 90),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+            "max_ms": max(latencies),
+            "queries_per_interaction": sum(s["queries"] for s in group) / len(group),
+            "error_rate": len(errors) / len(group),
+            "sample_errors": sorted(set(errors))[:3],
+        }
+    return report
+
+
+def print_report(report, sessions, wall_seconds):
+    print(f"\n{sessions} concurrent sessions, {report['ALL']['count']} interactions in {wall_seconds:.1f}s")
+    header = f"{'interaction':<22}{'count':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}{'queries':>9}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, row in report.items():
+        print(
+            f"{name:<22}{row['count']:>7}"
+            f"{row['p50_ms']:>9.0f}{row['p90_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}{row['max_ms']:>9.0f}"
+            f"{row['queries_per_interaction']:>9.1f}{row['error_rate']:>8.1%}"
+        )
+    print("(latencies in ms per interaction, writes until applied; queries = mean DB statements per interaction, including the write job)")
+    for name, row in report.items():
+        for error in row["sample_errors"]:
+            print(f"  [{name}] {error.strip().splitlines()[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-session load test for app.py")
+    parser.add_argument("--url", help="SQLAlchemy URL (defaults to the autoservicedb connection in secrets.toml)")
+    parser.add_argument("--sessions", type=int, default=10, help="number of concurrent clerk sessions")
+    parser.add_argument("--iterations", type=int, default=3, help="scripted loops per session")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds allowed per rerun")
+    parser.add_argument("--seed", action="store_true", help="seed load-test rows before running")
+    parser.add_argument("--seed-only", action="store_true", help="seed load-test rows and exit")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    args = parser.parse_args()
+
+    url = resolve_url(args.url)
+    if args.seed or args.seed_only:
+        seed_database(url)
+        print("Seeded load-test customers, vehicles, mechanics and parts.")
+        if args.seed_only:
+            return
+
+    samples = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.sessions) as pool:
+        futures = [
+            pool.submit(run_session, i, url, args.iterations, args.timeout)
+            for i in range(args.sessions)
+        ]
+        for future in as_completed(futures):
+            samples.extend(future.result())
+    wall_seconds = time.perf_counter() - start
+
+    report = summarize(samples)
+    print_report(report, args.sessions, wall_seconds)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"sessions": args.sessions, "wall_seconds": wall_seconds, "report": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Mechanic calendar helpers: vectorized time bucketing, utilization and idle gaps.
+
+All functions start from the appointment frame returned by
+``get_appointments_in_range`` in app.py (one row per appointment with
+``MechanicID``, ``AppointmentDate`` and ``DurationMinutes``); the report
+functions also take the mechanics frame to label rows. They work on whole
+columns with NumPy/pandas, so cost grows with the number of bookings rather
+than with per-row Python work.
+"""
+import numpy as np
+import pandas as pd
+
+DAY = np.timedelta64(1, "D")
+HOUR = np.timedelta64(1, "h")
+MINUTE = np.timedelta64(1, "m")
+
+
+def _intervals(appointments, range_start, range_end):
+    """Return start/end datetime64 arrays clipped to ``[range_start, range_end)``."""
+    starts = pd.to_datetime(appointments["AppointmentDate"]).to_numpy(dtype="datetime64[ns]")
+    minutes = appointments["DurationMinutes"].fillna(60).to_numpy(dtype="int64")
+    ends = starts + minutes * MINUTE
+    lo = np.datetime64(pd.Timestamp(range_start), "ns")
+    hi = np.datetime64(pd.Timestamp(range_end), "ns")
+    return np.clip(starts, lo, hi), np.clip(ends, lo, hi)
+
+
+def _split(starts, ends, origin, width):
+    """Expand each ``[start, end)`` into one row per ``width`` bucket it touches.
+
+    Returns ``(owner, bucket)``: the index of the source interval and the
+    bucket start for every expanded row.
+    """
+    first = (starts - origin) // width
+    last = (ends - np.timedelta64(1, "ns") - origin) // width
+    counts = last - first + 1
+    owner = np.repeat(np.arange(len(starts)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owner, origin + (first[owner] + step) * width
+
+
+def _time_offset(t):
+    return np.timedelta64(t.hour * 60 + t.minute, "m")
+
+
+def busy_intervals(appointments, range_start, range_end, shift_start, shift_end):
+    """Merged busy stretches per mechanic and day, limited to the shift window.
+
+    Appointments are cut at midnight, clipped to that day's
+    ``shift_start``-``shift_end`` window (``datetime.time`` values) and
+    overlapping bookings are merged, so the returned ``[Start, End)`` rows
+    never overlap and their total per day can never exceed the shift length.
+    """
+    columns = ["MechanicID", "Date", "Start", "End"]
+    empty = pd.DataFrame({
+        "MechanicID": pd.Series(dtype="int64"),
+        **{c: pd.Series(dtype="datetime64[ns]") for c in columns[1:]},
+    })
+    if appointments.empty:
+        return empty
+
+    starts, ends = _intervals(appointments, range_start, range_end)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    mechanic_ids = appointments["MechanicID"].to_numpy()[keep]
+    if not len(starts):
+        return empty
+
+    origin = np.datetime64(pd.Timestamp(range_start).normalize(), "ns")
+    owner, day = _split(starts, ends, origin, DAY)
+    df = pd.DataFrame({
+        "MechanicID": mechanic_ids[owner],
+        "Date": day,
+        "Start": np.maximum(starts[owner], day + _time_offset(shift_start)),
+        "End": np.minimum(ends[owner], day + _time_offset(shift_end)),
+    })
+    df = df[df["End"] > df["Start"]].sort_values(["MechanicID", "Date", "Start"], kind="mergesort")
+
+    # Running max of end times merges overlapping bookings; shifting it by one
+    # gives the moment the mechanic became free before each appointment, so
+    # starting each row no earlier than that drops the doubly booked minutes.
+    keys = [df["MechanicID"], df["Date"]]
+    busy_until = df.groupby(keys)["End"].cummax().groupby(keys).shift(1)
+    df["Start"] = df["Start"].where(~(busy_until > df["Start"]), busy_until)
+    df = df[df["End"] > df["Start"]]
+    return df[columns].reset_index(drop=True)
+
+
+def bucket_minutes(busy, freq="D"):
+    """Split busy stretches across the day (``"D"``) or hour (``"h"``) buckets they overlap.
+
+    ``busy`` comes from ``busy_intervals``. Returns one row per
+    (MechanicID, Bucket) with the busy minutes inside that bucket. A booking
+    from 16:30 to 18:00 contributes 30 minutes to the 16:00 bucket and 60
+    minutes to the 17:00 bucket.
+    """
+    columns = ["MechanicID", "Bucket", "BookedMinutes"]
+    if busy.empty:
+        return pd.DataFrame(columns=columns)
+    if freq == "D":
+        expanded = pd.DataFrame({
+            "MechanicID": busy["MechanicID"],
+            "Bucket": busy["Date"],
+            "BookedMinutes": (busy["End"] - busy["Start"]) / pd.Timedelta(minutes=1),
+        })
+    else:
+        starts = busy["Start"].to_numpy(dtype="datetime64[ns]")
+        ends = busy["End"].to_numpy(dtype="datetime64[ns]")
+        origin = busy["Date"].min().to_datetime64()
+        owner, bucket = _split(starts, ends, origin, HOUR)
+        overlap = np.minimum(ends[owner], bucket + HOUR) - np.maximum(starts[owner], bucket)
+        expanded = pd.DataFrame({
+            "MechanicID": busy["MechanicID"].to_numpy()[owner],
+            "Bucket": bucket,
+            "BookedMinutes": overlap / MINUTE,
+        })
+    return expanded.groupby(["MechanicID", "Bucket"], as_index=False)["BookedMinutes"].sum()
+
+
+def _days(range_start, range_end):
+    return pd.date_range(pd.Timestamp(range_start).normalize(), pd.Timestamp(range_end), freq="D", inclusive="left")
+
+
+def daily_utilization(appointments, mechanics, range_start, range_end, shift_start, shift_end):
+    """Busy share of each mechanic's shift, one column per day in the range.
+
+    Every mechanic and every day appears, so idle days show up as 0. Only time
+    inside the shift counts and overlapping bookings are counted once, so
+    values stay between 0 and 1.
+    """
+    days = _days(range_start, range_end)
+    shift_minutes = (_time_offset(shift_end) - _time_offset(shift_start)) / MINUTE
+    busy = busy_intervals(appointments, range_start, range_end, shift_start, shift_end)
+    buckets = bucket_minutes(busy, freq="D")
+    grid = (
+        buckets.pivot(index="MechanicID", columns="Bucket", values="BookedMinutes")
+        .reindex(index=mechanics["MechanicID"], columns=days)
+        .fillna(0.0)
+    )
+    grid = grid / shift_minutes
+    grid.index = _mechanic_names(mechanics)
+    grid.columns = [d.strftime("%a %d %b") for d in days]
+    return grid
+
+
+def hourly_load(appointments, mechanics, range_start, range_end, shift_start, shift_end):
+    """Busy minutes within the shift per mechanic and day (rows) for each hour of the shift (columns)."""
+    busy = busy_intervals(appointments, range_start, range_end, shift_start, shift_end)
+    buckets = bucket_minutes(busy, freq="h")
+    # Only shift hours can hold busy time; an end like 17:30 still needs the 17:00 column.
+    hours = list(range(shift_start.hour, shift_end.hour + (1 if shift_end.minute else 0)))
+    if buckets.empty:
+        return pd.DataFrame(columns=hours)
+    buckets["Date"] = buckets["Bucket"].dt.date
+    buckets["Hour"] = buckets["Bucket"].dt.hour
+    grid = buckets.pivot_table(
+        index=["MechanicID", "Date"], columns="Hour", values="BookedMinutes", aggfunc="sum", fill_value=0.0
+    ).reindex(columns=hours, fill_value=0.0)
+    names = pd.Series(_mechanic_names(mechanics), index=mechanics["MechanicID"].to_numpy())
+    grid.index = pd.MultiIndex.from_arrays(
+        [names.reindex(grid.index.get_level_values("MechanicID")).to_numpy(), grid.index.get_level_values("Date")],
+        names=["Mechanic", "Date"],
+    )
+    return grid
+
+
+def idle_gaps(appointments, mechanics, range_start, range_end, shift_start, shift_end, min_gap_minutes=15):
+    """Free stretches inside each mechanic's shift for every day in the range.
+
+    ``shift_start``/``shift_end`` are ``datetime.time`` values. Gaps are taken
+    between the merged busy stretches from ``busy_intervals``, so a gap only
+    appears when the mechanic is genuinely free for at least
+    ``min_gap_minutes``; a day with no bookings in the shift is one
+    full-shift gap.
+    """
+    columns = ["Mechanic", "Date", "GapStart", "GapEnd", "GapMinutes"]
+    busy = busy_intervals(appointments, range_start, range_end, shift_start, shift_end)
+    grid = pd.MultiIndex.from_product(
+        [mechanics["MechanicID"], _days(range_start, range_end)], names=["MechanicID", "Date"]
+    ).to_frame(index=False)
+    grid["ShiftStart"] = grid["Date"] + pd.Timedelta(_time_offset(shift_start))
+    grid["ShiftEnd"] = grid["Date"] + pd.Timedelta(_time_offset(shift_end))
+
+    # Each busy stretch closes the gap that began when the previous one ended
+    # (or at shift start); the last stretch of the day opens a gap to shift end.
+    busy = busy.merge(grid, on=["MechanicID", "Date"])
+    previous_end = busy.groupby(["MechanicID", "Date"])["End"].shift(1)
+    leading = pd.DataFrame({
+        "MechanicID": busy["MechanicID"],
+        "Date": busy["Date"],
+        "GapStart": previous_end.fillna(busy["ShiftStart"]),
+        "GapEnd": busy["Start"],
+    })
+    last = busy.groupby(["MechanicID", "Date"], as_index=False)["End"].max()
+    trailing = grid.merge(last, on=["MechanicID", "Date"], how="left")
+    trailing = pd.DataFrame({
+        "MechanicID": trailing["MechanicID"],
+        "Date": trailing["Date"],
+        "GapStart": trailing["End"].fillna(trailing["ShiftStart"]),
+        "GapEnd": trailing["ShiftEnd"],
+    })
+
+    gaps = pd.concat([leading, trailing], ignore_index=True) if not leading.empty else trailing
+    gaps["GapMinutes"] = (gaps["GapEnd"] - gaps["GapStart"]) / pd.Timedelta(minutes=1)
+    gaps = gaps[gaps["GapMinutes"] >= min_gap_minutes].copy()
+    names = pd.Series(_mechanic_names(mechanics), index=mechanics["MechanicID"].to_numpy())
+    gaps["Mechanic"] = names.reindex(gaps["MechanicID"]).to_numpy()
+    gaps["Date"] = gaps["Date"].dt.date
+    return gaps.sort_values(["Mechanic", "GapStart"])[columns].reset_index(drop=True)
+
+
+def _mechanic_names(mechanics):
+    # Qualified with the ID, as elsewhere in the app, so namesakes get separate rows.
+    return (
+        mechanics["FirstName"] + " " + mechanics["LastName"] + " (ID: " + mechanics["MechanicID"].astype(str) + ")"
+    ).to_list()
@@ -0,0 +1,350 @@
+"""Background write queue for order and booking submissions.
+
+Writes are submitted as jobs identified by an idempotency key and stored in a
+local SQLite file, so they survive an app restart. Each target database gets
+its own queue file (named after a hash of its URL), so a load test and the
+live app never claim each other's jobs and switching backends does not
+replay one database's writes against another. A small pool of worker
+threads applies them to the app database, retrying transient errors
+(deadlocks, lock wait timeouts, dropped connections, SQLite "database is
+locked") with exponential backoff.
+
+Jobs that touch the same existing row (one appointment, one order) are
+applied strictly in submission order: a job is only claimed once every earlier
+job for its entity has finished, so retries and parallel workers cannot let a
+later status change overtake an earlier one.
+
+Exactly-once comes from two layers: the idempotency key is a token issued per
+form submission, so submitting a key that is already queued is a no-op
+(double clicks), and every applied job records its key in the
+``appliedwrites`` table inside the same transaction as the write itself, so a
+job re-run after a crash finds its key and skips the write. Workers
+periodically put jobs stuck in 'running' (a crashed process or thread) back
+to pending, and drop finished jobs and ``appliedwrites`` rows once they are
+older than the retention period.
+"""
+import datetime
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+
+import db_backend
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+# MySQL error codes worth retrying: lock wait timeout, deadlock, server gone away, lost connection.
+TRANSIENT_MYSQL_ERRORS = {1205, 1213, 2006, 2013}
+TRANSIENT_MESSAGES = ("database is locked", "database is busy", "deadlock", "lock wait timeout")
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    Seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    IdempotencyKey TEXT NOT NULL UNIQUE,
+    Kind TEXT NOT NULL,
+    Entity TEXT,
+    Payload TEXT NOT NULL,
+    Status TEXT NOT NULL DEFAULT 'pending',
+    Attempts INTEGER NOT NULL DEFAULT 0,
+    NextAttemptAt REAL NOT NULL,
+    Result TEXT,
+    Error TEXT,
+    CreatedAt REAL NOT NULL,
+    UpdatedAt REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_next ON jobs (Status, NextAttemptAt);
+CREATE INDEX IF NOT EXISTS idx_jobs_entity ON jobs (Entity, Status);
+"""
+
+# Payload fields naming the existing row a job modifies; jobs sharing one are applied in order.
+ENTITY_FIELDS = {"appointment_id": "appointment", "order_id": "order"}
+
+
+# --- JOB HANDLERS ---
+def _place_order(s, payload):
+    order_id = db_backend.create_order(s, payload["customer_id"])
+    if not order_id:
+        raise RuntimeError("Failed to create order.")
+    for item in payload["items"]:
+        db_backend.call_procedure(s, "sp_AddOrderItem", order_id, item["part_id"], item["quantity"])
+    return order_id
+
+
+def _book_appointment(s, payload):
+    db_backend.call_procedure(
+        s, "sp_BookAppointment",
+        payload["customer_id"],
+        payload["vehicle_id"],
+        payload["mechanic_id"],
+        payload["service_id"],
+        datetime.datetime.fromisoformat(payload["date"]),
+        payload["duration"],
+    )
+
+
+def _update_appointment_status(s, payload):
+    db_backend.call_procedure(s, "sp_UpdateAppointmentStatus", payload["appointment_id"], payload["status"])
+
+
+def _cancel_appointment(s, payload):
+    db_backend.call_procedure(s, "sp_CancelAppointment", payload["appointment_id"])
+
+
+def _update_order_status(s, payload):
+    db_backend.call_procedure(s, "sp_UpdateOrderStatus", payload["order_id"], payload["status"])
+
+
+JOB_HANDLERS = {
+    "place_order": _place_order,
+    "book_appointment": _book_appointment,
+    "update_appointment_status": _update_appointment_status,
+    "cancel_appointment": _cancel_appointment,
+    "update_order_status": _update_order_status,
+}
+
+
+def job_entity(payload):
+    """Return e.g. ``"appointment:12"`` for jobs that modify an existing row, else None."""
+    for field, entity in ENTITY_FIELDS.items():
+        if field in payload:
+            return f"{entity}:{payload[field]}"
+    return None
+
+
+def queue_path(db_url, directory="."):
+    """Queue file for ``db_url``: one per target database, so jobs are only applied where they were meant to go."""
+    url = sqlalchemy.engine.make_url(db_url).render_as_string(hide_password=False)
+    return os.path.join(directory, f"write_queue-{hashlib.sha256(url.encode()).hexdigest()[:16]}.sqlite")
+
+
+_current_job = threading.local()
+
+
+def current_job_key():
+    """Idempotency key of the job the calling worker thread is applying, else None (used to attribute queries)."""
+    return getattr(_current_job, "key", None)
+
+
+def is_transient(exc):
+    """True for errors where retrying the whole transaction can succeed."""
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    orig = getattr(exc, "orig", None) or exc
+    if orig.args and orig.args[0] in TRANSIENT_MYSQL_ERRORS:
+        return True
+    message = str(orig).lower()
+    return any(m in message for m in TRANSIENT_MESSAGES)
+
+
+# --- QUEUE ---
+class WriteQueue:
+    """Persistent, idempotent write queue drained by a pool of worker threads."""
+
+    def __init__(self, db_url, queue_dir=".", workers=4, max_attempts=5, base_delay=0.2, max_delay=10.0,
+                 stale_after=60.0, retention_days=7, sweep_interval=60.0):
+        self.queue_path = queue_path(db_url, queue_dir)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stale_after = stale_after
+        self.retention = datetime.timedelta(days=retention_days)
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self.engine = sqlalchemy.create_engine(db_url, pool_pre_ping=True)
+        if self.engine.dialect.name == "sqlite":
+            db_backend.install_sqlite(self.engine)
+
+        with self._queue() as q:
+            q.executescript(QUEUE_SCHEMA)
+
+        self._wakeup = threading.Event()
+        self._claim_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"write-queue-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _queue(self):
+        return _QueueConnection(self.queue_path)
+
+    def submit(self, key, kind, payload):
+        """Queue a write. Returns False if a job with this key was already submitted."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown write job kind: {kind}")
+        now = time.time()
+        with self._queue() as q:
+            cursor = q.execute(
+                "INSERT OR IGNORE INTO jobs (IdempotencyKey, Kind, Entity, Payload, NextAttemptAt, CreatedAt, UpdatedAt) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?);",
+                (key, kind, job_entity(payload), json.dumps(payload), now, now, now),
+            )
+            created = cursor.rowcount == 1
+        self._wakeup.set()
+        return created
+
+    def status(self, key):
+        """Return the job's state as a dict (status, attempts, result, error), or None if unknown."""
+        with self._queue() as q:
+            row = q.execute(
+                "SELECT Status, Attempts, Result, Error FROM jobs WHERE IdempotencyKey = ?;", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "status": row[0],
+            "attempts": row[1],
+            "result": json.loads(row[2]) if row[2] is not None else None,
+            "error": row[3],
+        }
+
+    def _claim(self):
+        with self._claim_lock, self._queue() as q:
+            q.execute("BEGIN IMMEDIATE;")
+            # Oldest due job whose entity has no earlier job still pending or running.
+            row = q.execute(
+                "SELECT j.IdempotencyKey, j.Kind, j.Payload, j.Attempts FROM jobs j "
+                "WHERE j.Status = ? AND j.NextAttemptAt <= ? AND NOT EXISTS ("
+                "    SELECT 1 FROM jobs e WHERE e.Entity = j.Entity AND e.Seq < j.Seq AND e.Status IN (?, ?)"
+                ") ORDER BY j.Seq LIMIT 1;",
+                (PENDING, time.time(), PENDING, RUNNING),
+            ).fetchone()
+            if row is not None:
+                q.execute(
+                    "UPDATE jobs SET Status = ?, Attempts = Attempts + 1, UpdatedAt = ? WHERE IdempotencyKey = ?;",
+                    (RUNNING, time.time(), row[0]),
+                )
+            q.execute("COMMIT;")
+        return row
+
+    def _finish(self, key, status, result=None, error=None, retry_at=None):
+        with self._queue() as q:
+            q.execute(
+                "UPDATE jobs SET Status = ?, Result = ?, Error = ?, NextAttemptAt = COALESCE(?, NextAttemptAt), "
+                "UpdatedAt = ? WHERE IdempotencyKey = ?;",
+                (status, json.dumps(result) if result is not None else None, error, retry_at, time.time(), key),
+            )
+
+    def _backoff(self, attempts):
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+    def _sweep(self):
+        """Reclaim jobs stuck in 'running' and drop history older than the retention period."""
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        cutoff = now - self.retention.total_seconds()
+        with self._claim_lock, self._queue() as q:
+            # A worker that died between claiming and finishing leaves its job 'running';
+            # re-running it is safe because appliedwrites skips a write that committed.
+            q.execute(
+                "UPDATE jobs SET Status = ?, UpdatedAt = ? WHERE Status = ? AND UpdatedAt < ?;",
+                (PENDING, now, RUNNING, now - self.stale_after),
+            )
+            # Jobs that could not run within the retention period are given up on, so their
+            # appliedwrites rows can be removed below without risking a second apply.
+            q.execute(
+                "UPDATE jobs SET Status = ?, Error = ?, UpdatedAt = ? WHERE Status = ? AND CreatedAt < ?;",
+                (FAILED, "Expired before it could be applied.", now, PENDING, cutoff),
+            )
+            q.execute("DELETE FROM jobs WHERE Status IN (?, ?) AND UpdatedAt < ?;", (DONE, FAILED, cutoff))
+        # AppliedAt uses the database clock, so allow a day of slack for time zone differences.
+        applied_cutoff = datetime.datetime.now() - self.retention - datetime.timedelta(days=1)
+        with Session(self.engine) as s:
+            s.execute(text("DELETE FROM appliedwrites WHERE AppliedAt < :cutoff;"), {"cutoff": applied_cutoff})
+            s.commit()
+
+    def _apply(self, key, kind, payload):
+        with Session(self.engine) as s:
+            applied = s.execute(
+                text("SELECT ResultID FROM appliedwrites WHERE IdempotencyKey = :k;"), {"k": key}
+            ).first()
+            if applied is not None:
+                return applied.ResultID
+            result = JOB_HANDLERS[kind](s, payload)
+            s.execute(
+                text("INSERT INTO appliedwrites (IdempotencyKey, ResultID) VALUES (:k, :r);"),
+                {"k": key, "r": result},
+            )
+            s.commit()
+            return result
+
+    def _run_job(self, key, kind, payload, attempts):
+        try:
+            result = self._apply(key, kind, payload)
+        except IntegrityError as e:
+            # Another process applied this key first; its recorded result is authoritative.
+            with Session(self.engine) as s:
+                applied = s.execute(
+                    text("SELECT ResultID FROM appliedwrites WHERE IdempotencyKey = :k;"), {"k": key}
+                ).first()
+            if applied is not None:
+                self._finish(key, DONE, result=applied.ResultID)
+            else:
+                self._finish(key, FAILED, error=str(getattr(e, "orig", e)))
+            return
+        except Exception as e:
+            if is_transient(e) and attempts < self.max_attempts:
+                self._finish(key, PENDING, error=str(e), retry_at=time.time() + self._backoff(attempts))
+            else:
+                self._finish(key, FAILED, error=str(getattr(e, "orig", e)))
+            return
+        self._finish(key, DONE, result=result)
+
+    def _worker(self):
+        while True:
+            try:
+                self._sweep()
+            except Exception:
+                # Retried on the next sweep; the queue itself keeps working without it.
+                pass
+            try:
+                job = self._claim()
+            except sqlite3.OperationalError:
+                # Queue file busy; try again after the wait.
+                job = None
+            if job is not None:
+                key, kind, payload, attempts = job
+                _current_job.key = key
+                try:
+                    self._run_job(key, kind, json.loads(payload), attempts + 1)
+                except Exception as e:
+                    # Recording the outcome failed (e.g. queue file busy after the commit). Put the
+                    # job back with backoff; appliedwrites makes the re-run a no-op if it committed.
+                    # If even that fails, the sweep reclaims it once it has been 'running' too long.
+                    try:
+                        self._finish(key, PENDING, error=str(e), retry_at=time.time() + self._backoff(attempts + 1))
+                    except Exception:
+                        pass
+                finally:
+                    _current_job.key = None
+                continue
+            self._wakeup.wait(timeout=0.5)
+            self._wakeup.clear()
+
+
+class _QueueConnection:
+    """Short-lived autocommit connection to the queue file, usable from any thread."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode = WAL;")
+        return self.conn
+
+    def __exit__(self, *exc):
+        if exc[0] is not None and self.conn.in_transaction:
+            self.conn.execute("ROLLBACK;")
+        self.conn.close()